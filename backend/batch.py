@@ -0,0 +1,316 @@
+import asyncio
+import csv
+import io
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage
+
+from backend.config import BATCH_JOBS_DIR, BATCH_WORKERS
+from backend.graph import app as graph_app, create_initial_state
+from backend.llm import build_routing
+
+
+JOBS: Dict[str, "BatchJob"] = {}
+_running_tasks = set()
+
+
+def parse_queries(filename: str, content: bytes) -> List[Dict[str, Any]]:
+    text = content.decode("utf-8-sig")
+
+    if filename.lower().endswith(".csv"):
+        # CSV carries only ids and queries; per-query routing needs NDJSON.
+        # An empty id cell means no id, as CSV cannot express null.
+        rows = [
+            {"id": row.get("id") or None, "user_query": row.get("user_query")}
+            for row in csv.DictReader(io.StringIO(text))
+        ]
+    else:
+        rows = []
+        for line_number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on line {line_number}: {e}")
+            if not isinstance(row, dict):
+                raise ValueError(f"Line {line_number} must be a JSON object with a user_query.")
+            rows.append(row)
+
+    items = []
+    seen_ids = set()
+    for index, row in enumerate(rows):
+        user_query = row.get("user_query")
+        if not isinstance(user_query, str) or not user_query.strip():
+            raise ValueError(f"Entry {index + 1} has no user_query.")
+        user_query = user_query.strip()
+
+        item_id = str(index + 1 if row.get("id") is None else row["id"])
+        if item_id in seen_ids:
+            raise ValueError(f"Duplicate id '{item_id}' in entry {index + 1}.")
+        seen_ids.add(item_id)
+
+        model_routing = row.get("model_routing") or None
+        hedge = row.get("hedge")
+        build_routing(model_routing, hedge)
+
+        items.append({
+            "id": item_id,
+            "user_query": user_query,
+            "model_routing": model_routing,
+            "hedge": hedge,
+        })
+
+    if not items:
+        raise ValueError("No queries found in the uploaded file.")
+    return items
+
+
+class BatchJob:
+    def __init__(self, job_id: str, items: List[Dict[str, Any]]):
+        self.job_id = job_id
+        self.items = items
+        self.job_dir = BATCH_JOBS_DIR / job_id
+        self.input_path = self.job_dir / "input.ndjson"
+        self.output_path = self.job_dir / "output.ndjson"
+        self.status_path = self.job_dir / "job.json"
+
+        self.status = "pending"
+        self.total = len(items)
+        self.completed = 0
+        self.failed = 0
+        self.processed_this_run = 0
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def read_checkpoint(self) -> Dict[str, str]:
+        if not self.output_path.exists():
+            return {}
+
+        done = {}
+        with open(self.output_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                    done[result["id"]] = result["status"]
+                except (json.JSONDecodeError, KeyError):
+                    # A partially written final line from an interrupted run.
+                    continue
+        return done
+
+    # Drops failed rows so a resumed run retries them instead of appending duplicates.
+    def compact_output(self) -> set:
+        completed_rows = {}
+        if self.output_path.exists():
+            with open(self.output_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        result = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if result.get("status") == "completed":
+                        completed_rows[result["id"]] = line if line.endswith("\n") else line + "\n"
+
+        tmp_path = self.output_path.with_suffix(".ndjson.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(completed_rows.values())
+        tmp_path.replace(self.output_path)
+        return set(completed_rows)
+
+    def to_dict(self) -> Dict[str, Any]:
+        throughput = None
+        eta_seconds = None
+        remaining = self.total - self.completed - self.failed
+
+        if self.started_at:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+            if self.processed_this_run and elapsed > 0:
+                per_second = self.processed_this_run / elapsed
+                throughput = round(per_second * 60, 2)
+                eta_seconds = round(remaining / per_second, 1) if self.status == "running" else 0.0
+
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "remaining": remaining,
+            "throughput_per_minute": throughput,
+            "eta_seconds": eta_seconds,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "results_url": f"/batch/jobs/{self.job_id}/results",
+        }
+
+    def save(self):
+        self.status_path.write_text(json.dumps(self.to_dict(), indent=2), encoding="utf-8")
+
+
+def create_job(filename: str, content: bytes) -> BatchJob:
+    items = parse_queries(filename, content)
+    job = BatchJob(str(uuid.uuid4()), items)
+
+    job.job_dir.mkdir(parents=True, exist_ok=True)
+    with open(job.input_path, "w", encoding="utf-8") as f:
+        for item in items:
+            f.write(json.dumps(item) + "\n")
+    job.save()
+
+    JOBS[job.job_id] = job
+    return job
+
+
+def get_job(job_id: str) -> Optional[BatchJob]:
+    if job_id in JOBS:
+        return JOBS[job_id]
+
+    # Only canonical UUIDs name a job directory; anything else never touches the filesystem.
+    try:
+        if str(uuid.UUID(job_id)) != job_id:
+            return None
+    except ValueError:
+        return None
+
+    job_dir = BATCH_JOBS_DIR / job_id
+    if not (job_dir / "input.ndjson").exists():
+        return None
+
+    with open(job_dir / "input.ndjson", encoding="utf-8") as f:
+        items = [json.loads(line) for line in f if line.strip()]
+
+    job = BatchJob(job_id, items)
+    if job.status_path.exists():
+        saved = json.loads(job.status_path.read_text(encoding="utf-8"))
+        job.status = saved.get("status", "pending")
+        job.created_at = saved.get("created_at", job.created_at)
+        job.error = saved.get("error")
+
+    checkpoint = job.read_checkpoint()
+    job.completed = sum(1 for status in checkpoint.values() if status == "completed")
+    job.failed = len(checkpoint) - job.completed
+
+    # Jobs on disk that claim to be running were cut off by a server restart.
+    if job.status == "running":
+        job.status = "interrupted"
+
+    JOBS[job_id] = job
+    return job
+
+
+async def run_debate(item: Dict[str, Any]) -> Dict[str, Any]:
+    session_id = str(uuid.uuid4())
+    initial_state = create_initial_state(
+        session_id,
+        item["user_query"],
+        build_routing(item.get("model_routing"), item.get("hedge"), batch=True)
+    )
+
+    transcript = []
+    tool_outputs = []
+    verdict = None
+
+    async for event in graph_app.astream(initial_state, stream_mode="updates"):
+        for node, update in event.items():
+            if update.get("tool_output"):
+                tool_outputs.append(update["tool_output"])
+
+            for msg in update.get("messages", []):
+                if isinstance(msg, AIMessage) and msg.content.strip():
+                    transcript.append({"node": node, "name": msg.name, "content": msg.content})
+                    if node == "verdict":
+                        verdict = msg.content
+
+    return {
+        "session_id": session_id,
+        "verdict": verdict,
+        "messages": transcript,
+        "tool_outputs": tool_outputs,
+    }
+
+
+async def run_job(job: BatchJob):
+    done_ids = job.compact_output()
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in job.items:
+        if item["id"] not in done_ids:
+            queue.put_nowait(item)
+
+    job.status = "running"
+    job.completed = len(done_ids)
+    job.failed = 0
+    job.processed_this_run = 0
+    job.started_at = time.time()
+    job.finished_at = None
+    job.error = None
+    job.save()
+    print(f"Batch job {job.job_id}: {queue.qsize()} of {job.total} queries to run")
+
+    write_lock = asyncio.Lock()
+
+    async def record(result: Dict[str, Any]):
+        async with write_lock:
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            if result["status"] == "completed":
+                job.completed += 1
+            else:
+                job.failed += 1
+            job.processed_this_run += 1
+            job.save()
+
+    async def worker():
+        while True:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            start = time.monotonic()
+            try:
+                result = await run_debate(item)
+                result["status"] = "completed"
+            except Exception as e:
+                print(f"Batch job {job.job_id}: query '{item['id']}' failed: {e}")
+                result = {"status": "failed", "error": str(e)}
+
+            result.update({
+                "id": item["id"],
+                "user_query": item["user_query"],
+                "duration_seconds": round(time.monotonic() - start, 2),
+            })
+            await record(result)
+
+    try:
+        with open(job.output_path, "a", encoding="utf-8") as output:
+            workers = [asyncio.create_task(worker()) for _ in range(BATCH_WORKERS)]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                # Stop the remaining workers before the output file closes.
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+        job.status = "completed"
+    except Exception as e:
+        print(f"Batch job {job.job_id} aborted: {e}")
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        job.finished_at = time.time()
+        job.save()
+        print(f"Batch job {job.job_id} {job.status}: {job.completed} completed, {job.failed} failed")
+
+
+def start_job(job: BatchJob):
+    job.status = "queued"
+    task = asyncio.create_task(run_job(job))
+    _running_tasks.add(task)
+    task.add_done_callback(_running_tasks.discard)
@@ -11,6 +11,39 @@ if not GROQ_API_KEY:
 MODEL_NAME = "llama-3.1-8b-instant"
 TEMPERATURE = 0.5
 
+# Per-role model routing. Roles are resolved in backend.llm.resolve_role; each
+# entry can be overridden per debate through the "model_routing" request field.
+MODEL_ROUTING = {
+    "analyst_round_1": {"model": "llama-3.1-8b-instant", "temperature": TEMPERATURE, "fallback": "llama-3.3-70b-versatile"},
+    "analyst": {"model": MODEL_NAME, "temperature": TEMPERATURE, "fallback": "llama-3.3-70b-versatile"},
+    "moderator": {"model": MODEL_NAME, "temperature": TEMPERATURE, "fallback": "llama-3.3-70b-versatile"},
+    "verdict": {"model": "llama-3.3-70b-versatile", "temperature": 0.3, "fallback": MODEL_NAME},
+}
+
+# Models a per-debate "model_routing" override may name, in addition to the
+# models and fallbacks already listed in MODEL_ROUTING.
+ALLOWED_MODELS = [
+    "llama-3.1-8b-instant",
+    "llama-3.3-70b-versatile",
+]
+
+LLM_REQUEST_TIMEOUT = 30.0
+# SDK retries are off for the primary model so rate limits, timeouts,
+# connection errors and 5xx responses go straight to the role's fallback model
+# (see backend.llm). The fallback call keeps the SDK's default retries.
+LLM_PRIMARY_MAX_RETRIES = 0
+LLM_FALLBACK_MAX_RETRIES = 2
+
+# Hedged requests: if a turn is slower than the model's observed p95 latency,
+# a duplicate call is issued and whichever response arrives first is used.
+HEDGE_ENABLED = False
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 20
+HEDGE_LATENCY_WINDOW = 200
+HEDGE_DEFAULT_DELAY = 8.0
+HEDGE_MIN_DELAY = 1.0
+HEDGE_MAX_WORKERS = 16
+
 MAX_WORD_LIMIT = 200
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -20,6 +53,15 @@ DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 SQLITE_DB_PATH = DATA_DIR / "debate_history.db"
 CHROMA_PERSIST_DIRECTORY = DATA_DIR / "vector_store"
+BATCH_JOBS_DIR = DATA_DIR / "batch_jobs"
+
+BATCH_WORKERS = 4
+# Per-model request budget for batch jobs only; interactive /ws and /stream
+# debates are never throttled and never wait behind batch workers.
+# Set to None to disable.
+BATCH_REQUESTS_PER_MINUTE = 30
+
+WS_MAX_CONCURRENT_DEBATES = 4
 
 EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
 CHUNK_SIZE = 1000
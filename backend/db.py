@@ -1,4 +1,5 @@
 import datetime
+import threading
 from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime
 from sqlalchemy.orm import sessionmaker, declarative_base
 from backend.config import SQLITE_DB_PATH
@@ -11,6 +12,9 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# SQLite allows a single writer; serialize logging across concurrent debates.
+_write_lock = threading.Lock()
+
 class DebateLog(Base):
     __tablename__ = "debate_logs"
 
@@ -34,6 +38,10 @@ def get_db():
         db.close()
 
 def log_agent_message(session_id: str, round_number: int, agent_name: str, message: str):
+    with _write_lock:
+        _log_agent_message(session_id, round_number, agent_name, message)
+
+def _log_agent_message(session_id: str, round_number: int, agent_name: str, message: str):
     db = SessionLocal()
     try:
         log_entry = DebateLog(
@@ -1,11 +1,12 @@
 import operator
 import json
-from typing import Annotated, List, TypedDict, Dict, Any
+import threading
+from typing import Annotated, List, TypedDict, Dict, Any, Optional
 
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, BaseMessage
 from langgraph.graph import StateGraph, END
 
-from backend.llm import get_llm
+from backend.llm import invoke_llm, resolve_role
 from backend.prompts import get_system_prompt
 from backend.db import log_agent_message
 from backend.rag import query_knowledge_base
@@ -43,6 +44,29 @@ class AgentState(TypedDict):
     messages: Annotated[List[BaseMessage], operator.add]
     tool_calls_to_execute: List[Dict[str, Any]]
     tool_output: Dict[str, Any]
+    model_routing: Dict[str, Any]
+    # Nodes run in worker threads that outlive a cancelled asyncio task, so
+    # invoke_llm checks this event before sending each request.
+    cancel_event: threading.Event
+
+
+def create_initial_state(
+    session_id: str,
+    user_query: str,
+    model_routing: Dict[str, Any],
+    cancel_event: Optional[threading.Event] = None
+) -> AgentState:
+    return {
+        "session_id": session_id,
+        "user_query": user_query,
+        "rag_context": "",
+        "round_number": 1,
+        "messages": [],
+        "tool_output": {},
+        "tool_calls_to_execute": [],
+        "model_routing": model_routing,
+        "cancel_event": cancel_event or threading.Event()
+    }
 
 
 def retrieve_context_node(state: AgentState):
@@ -51,7 +75,6 @@ def retrieve_context_node(state: AgentState):
 
 
 def run_agent(agent_name: str, state: AgentState) -> Dict[str, Any]:
-    llm = get_llm()
     sys_prompt = get_system_prompt(agent_name, state["round_number"])
 
     messages = [
@@ -68,7 +91,12 @@ def run_agent(agent_name: str, state: AgentState) -> Dict[str, Any]:
             )
         )
 
-    response = llm.invoke(messages)
+    response = invoke_llm(
+        resolve_role(agent_name, state["round_number"]),
+        messages,
+        state.get("model_routing"),
+        state["cancel_event"]
+    )
     content = response.content.strip()
 
     log_agent_message(
@@ -147,8 +175,6 @@ def moderator_node(state: AgentState):
 
 
 def verdict_node(state: AgentState):
-    llm = get_llm()
-
     instruction = (
         "The debate rounds are finished. You are the Moderator. "
         "Review the entire discussion above. "
@@ -159,7 +185,7 @@ def verdict_node(state: AgentState):
 
     messages = state["messages"] + [HumanMessage(content=instruction)]
 
-    response = llm.invoke(messages)
+    response = invoke_llm("verdict", messages, state.get("model_routing"), state["cancel_event"])
     content = response.content.strip()
 
     log_agent_message(
@@ -1,21 +1,299 @@
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from groq import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from langchain_core.messages import BaseMessage
 from langchain_groq import ChatGroq
-from backend.config import GROQ_API_KEY, MODEL_NAME, TEMPERATURE
+from backend.config import (
+    GROQ_API_KEY,
+    MODEL_NAME,
+    TEMPERATURE,
+    MODEL_ROUTING,
+    ALLOWED_MODELS,
+    LLM_REQUEST_TIMEOUT,
+    LLM_PRIMARY_MAX_RETRIES,
+    LLM_FALLBACK_MAX_RETRIES,
+    BATCH_REQUESTS_PER_MINUTE,
+    HEDGE_ENABLED,
+    HEDGE_PERCENTILE,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_LATENCY_WINDOW,
+    HEDGE_DEFAULT_DELAY,
+    HEDGE_MIN_DELAY,
+    HEDGE_MAX_WORKERS,
+)
+
+class DebateCancelled(Exception):
+    pass
+
+
+FALLBACK_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
 
-def get_llm():
+ROUTABLE_MODELS = set(ALLOWED_MODELS) | {
+    model
+    for route in MODEL_ROUTING.values()
+    for model in (route["model"], route.get("fallback"))
+    if model
+}
+
+
+@lru_cache(maxsize=32)
+def get_llm(
+    model_name: str = MODEL_NAME,
+    temperature: float = TEMPERATURE,
+    max_retries: int = LLM_FALLBACK_MAX_RETRIES
+):
     if not GROQ_API_KEY:
         raise ValueError("GROQ_API_KEY is missing. Please set it in your .env file.")
 
     try:
         llm = ChatGroq(
             groq_api_key=GROQ_API_KEY,
-            model_name=MODEL_NAME,
-            temperature=TEMPERATURE,
+            model_name=model_name,
+            temperature=temperature,
+            request_timeout=LLM_REQUEST_TIMEOUT,
+            max_retries=max_retries,
         )
         return llm
     except Exception as e:
         print(f"Error initializing ChatGroq LLM: {e}")
         raise
 
+
+class LatencyTracker:
+    def __init__(self, window: int = HEDGE_LATENCY_WINDOW):
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, model_name: str, seconds: float):
+        with self._lock:
+            self._samples[model_name].append(seconds)
+
+    def percentile(self, model_name: str, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(model_name, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        index = min(len(samples) - 1, math.ceil(pct / 100 * len(samples)) - 1)
+        return samples[index]
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute: Optional[float]):
+        self._interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def try_acquire(self) -> bool:
+        if not self._interval:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            if self._next_slot > now:
+                return False
+            self._next_slot = now + self._interval
+            return True
+
+
+latency_tracker = LatencyTracker()
+# Provider limits are per model, so batch debates get one limiter per model.
+# Keys are bounded by ROUTABLE_MODELS.
+_batch_limiters: Dict[str, RateLimiter] = {}
+_batch_limiters_lock = threading.Lock()
+_hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS, thread_name_prefix="llm-hedge")
+
+
+def resolve_role(agent_name: str, round_number: int) -> str:
+    if agent_name == "Moderator":
+        return "moderator"
+    return "analyst_round_1" if round_number == 1 else "analyst"
+
+
+def build_routing(
+    overrides: Optional[Dict[str, Any]] = None,
+    hedge: Optional[bool] = None,
+    batch: bool = False
+) -> Dict[str, Any]:
+    roles = {role: dict(route) for role, route in MODEL_ROUTING.items()}
+
+    if overrides is not None and not isinstance(overrides, dict):
+        raise ValueError("model_routing must be an object mapping roles to models.")
+    if hedge is not None and not isinstance(hedge, bool):
+        raise ValueError("hedge must be true or false.")
+
+    for role, override in (overrides or {}).items():
+        if role not in roles:
+            raise ValueError(f"Unknown model routing role '{role}'. Expected one of: {', '.join(roles)}")
+        if isinstance(override, str):
+            override = {"model": override}
+        if not isinstance(override, dict):
+            raise ValueError(f"Model routing for '{role}' must be a model name or an object.")
+        unknown = set(override) - {"model", "temperature", "fallback"}
+        if unknown:
+            raise ValueError(f"Unsupported model routing keys for '{role}': {', '.join(sorted(unknown))}")
+        for key in ("model", "fallback"):
+            if key == "fallback" and override.get(key) is None:
+                continue
+            if key in override and override[key] not in ROUTABLE_MODELS:
+                raise ValueError(
+                    f"Model '{override[key]}' for '{role}' is not allowed. "
+                    f"Expected one of: {', '.join(sorted(ROUTABLE_MODELS))}"
+                )
+        if "temperature" in override:
+            temperature = override["temperature"]
+            if isinstance(temperature, bool) or not isinstance(temperature, (int, float)) or not 0 <= temperature <= 2:
+                raise ValueError(f"Temperature for '{role}' must be a number between 0 and 2.")
+        roles[role].update(override)
+
+    return {"roles": roles, "hedge": HEDGE_ENABLED if hedge is None else hedge, "batch": batch}
+
+
+def _batch_limiter(routing: Dict[str, Any], model_name: str) -> Optional[RateLimiter]:
+    if not routing.get("batch") or not BATCH_REQUESTS_PER_MINUTE:
+        return None
+    with _batch_limiters_lock:
+        if model_name not in _batch_limiters:
+            _batch_limiters[model_name] = RateLimiter(BATCH_REQUESTS_PER_MINUTE)
+        return _batch_limiters[model_name]
+
+
+def _raise_if_cancelled(cancel_event: Optional[threading.Event]):
+    if cancel_event is not None and cancel_event.is_set():
+        raise DebateCancelled("Debate was cancelled.")
+
+
+# Checked again after the limiter wait, which can take several seconds, so a
+# cancelled debate never sends the request it was queued for.
+def _acquire(routing: Dict[str, Any], model_name: str, cancel_event: Optional[threading.Event]):
+    _raise_if_cancelled(cancel_event)
+    limiter = _batch_limiter(routing, model_name)
+    if limiter:
+        limiter.acquire()
+        _raise_if_cancelled(cancel_event)
+
+
+def _try_acquire(routing: Dict[str, Any], model_name: str) -> bool:
+    limiter = _batch_limiter(routing, model_name)
+    return limiter.try_acquire() if limiter else True
+
+
+def hedge_delay(model_name: str) -> float:
+    observed = latency_tracker.percentile(model_name, HEDGE_PERCENTILE)
+    if observed is None:
+        return HEDGE_DEFAULT_DELAY
+    return max(HEDGE_MIN_DELAY, observed)
+
+
+def _invoke_timed(model_name: str, temperature: float, messages: List[BaseMessage], max_retries: int):
+    start = time.monotonic()
+    response = get_llm(model_name, temperature, max_retries).invoke(messages)
+    latency_tracker.record(model_name, time.monotonic() - start)
+    return response
+
+
+def _invoke_fallback(
+    routing: Dict[str, Any],
+    route: Dict[str, Any],
+    messages: List[BaseMessage],
+    error: Exception,
+    cancel_event: Optional[threading.Event]
+):
+    fallback = route.get("fallback")
+    if not fallback or fallback == route["model"]:
+        raise error
+    _raise_if_cancelled(cancel_event)
+    print(f"Model '{route['model']}' failed ({type(error).__name__}), falling back to '{fallback}'")
+    _acquire(routing, fallback, cancel_event)
+    return _invoke_timed(fallback, route["temperature"], messages, LLM_FALLBACK_MAX_RETRIES)
+
+
+def _invoke_primary(
+    routing: Dict[str, Any],
+    route: Dict[str, Any],
+    messages: List[BaseMessage],
+    cancel_event: Optional[threading.Event]
+):
+    _acquire(routing, route["model"], cancel_event)
+    try:
+        return _invoke_timed(route["model"], route["temperature"], messages, LLM_PRIMARY_MAX_RETRIES)
+    except FALLBACK_ERRORS as e:
+        return _invoke_fallback(routing, route, messages, e, cancel_event)
+
+
+def _invoke_hedged(
+    routing: Dict[str, Any],
+    route: Dict[str, Any],
+    messages: List[BaseMessage],
+    cancel_event: Optional[threading.Event]
+):
+    # Take the batch rate-limit slot first so the hedge timer measures
+    # provider latency, not time spent queued behind other batch debates.
+    _acquire(routing, route["model"], cancel_event)
+    delay = hedge_delay(route["model"])
+    started = threading.Event()
+
+    def primary_call():
+        started.set()
+        return _invoke_timed(route["model"], route["temperature"], messages, LLM_PRIMARY_MAX_RETRIES)
+
+    primary = _hedge_executor.submit(primary_call)
+    # Likewise start the timer only once the executor actually runs the call.
+    started.wait()
+    pending = {primary}
+    done, _ = wait(pending, timeout=delay)
+
+    # Batch debates hedge only with spare capacity in their model's budget;
+    # interactive debates are unthrottled and always hedge.
+    if not done and (cancel_event is None or not cancel_event.is_set()) and _try_acquire(routing, route["model"]):
+        print(f"Model '{route['model']}' slower than {delay:.2f}s, sending hedged request")
+        # The losing call cannot be aborted mid-request; its result is simply discarded.
+        pending.add(_hedge_executor.submit(
+            _invoke_timed, route["model"], route["temperature"], messages, LLM_PRIMARY_MAX_RETRIES
+        ))
+
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+
+    # Every call to the primary model failed; fall back once for the whole turn.
+    if isinstance(error, FALLBACK_ERRORS):
+        return _invoke_fallback(routing, route, messages, error, cancel_event)
+    raise error
+
+
+def invoke_llm(
+    role: str,
+    messages: List[BaseMessage],
+    routing: Optional[Dict[str, Any]] = None,
+    cancel_event: Optional[threading.Event] = None
+):
+    routing = routing or build_routing()
+    route = routing["roles"][role]
+
+    if routing.get("hedge"):
+        return _invoke_hedged(routing, route, messages, cancel_event)
+    return _invoke_primary(routing, route, messages, cancel_event)
+
+
 if __name__ == "__main__":
     print("Testing llm.py connection to Groq...")
     try:
@@ -26,4 +304,4 @@ if __name__ == "__main__":
     except ValueError as ve:
         print(f"Configuration Error: {ve}")
     except Exception as e:
-        print(f"An error occurred during Groq connection test: {e}")
\ No newline at end of file
+        print(f"An error occurred during Groq connection test: {e}")
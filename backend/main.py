@@ -1,16 +1,21 @@
+import asyncio
+import threading
 import uuid
 import os
 import json
+from typing import Any, Dict
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, UploadFile, File, HTTPException
+from fastapi.responses import StreamingResponse, FileResponse
 from langchain_core.messages import AIMessage
 from fastapi.middleware.cors import CORSMiddleware
 
 from backend.db import init_db
 from backend.rag import add_file_to_knowledge_base, clear_knowledge_base
-from backend.graph import app as graph_app, AgentState
-from backend.config import Colors
+from backend.graph import app as graph_app, create_initial_state
+from backend.llm import build_routing
+from backend.batch import create_job, get_job, start_job
+from backend.config import Colors, WS_MAX_CONCURRENT_DEBATES
 
 
 app = FastAPI(
@@ -67,60 +72,192 @@ async def add_kb_file(file_path: str):
         return {"error": f"File not found at path: {file_path}"}, 404
 
 
+@app.post("/batch/jobs")
+async def create_batch_job(file: UploadFile = File(...)):
+    content = await file.read()
+    try:
+        job = create_job(file.filename or "", content)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    start_job(job)
+    print(f"Started batch job {job.job_id} with {job.total} queries from '{file.filename}'")
+    return job.to_dict()
+
+@app.get("/batch/jobs/{job_id}")
+async def get_batch_job(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Batch job not found: {job_id}")
+    return job.to_dict()
+
+@app.post("/batch/jobs/{job_id}/resume")
+async def resume_batch_job(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Batch job not found: {job_id}")
+    if job.status in ("queued", "running"):
+        raise HTTPException(status_code=409, detail=f"Batch job {job_id} is already {job.status}.")
+
+    start_job(job)
+    return job.to_dict()
+
+@app.get("/batch/jobs/{job_id}/results")
+async def get_batch_results(job_id: str):
+    job = get_job(job_id)
+    if job is None or not job.output_path.exists():
+        raise HTTPException(status_code=404, detail=f"No results for batch job: {job_id}")
+    return FileResponse(job.output_path, media_type="application/x-ndjson", filename=f"{job_id}.ndjson")
+
+
+async def stream_debate_ws(session_id: str, initial_state, send):
+    # Stream LangChain graph output over WebSocket
+    async for event in graph_app.astream(initial_state, stream_mode="updates"):
+        for _, update in event.items():
+            messages = update.get("messages", [])
+            tool_outputs = update.get("tool_output", {})
+
+            # Send tool results if any
+            if tool_outputs:
+                await send({"type": "tool_output", "session_id": session_id, "data": tool_outputs})
+
+            # Send AIMessage content
+            for msg in messages:
+                if isinstance(msg, AIMessage) and msg.content.strip():
+                    await send({
+                        "type": "ai_message",
+                        "session_id": session_id,
+                        "name": msg.name,
+                        "content": msg.content
+                    })
+            for msg in messages:
+                print("MSG:", msg, "NAME:", msg.name)
+    await send({"type": "debate_finished", "session_id": session_id})
+    print(f"Debate finished for session ID: {session_id}")
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     print(f"WebSocket connection accepted from {websocket.client.host}:{websocket.client.port}")
+
+    # Debates run as concurrent tasks; every frame goes through this queue so a
+    # single writer owns the socket and frames are never interleaved mid-send.
+    outbox: asyncio.Queue = asyncio.Queue()
+    debates: Dict[str, asyncio.Task] = {}
+    cancel_events: Dict[str, threading.Event] = {}
+
+    async def writer():
+        try:
+            while True:
+                payload = await outbox.get()
+                if payload is None:
+                    return
+                await websocket.send_json(payload)
+        except Exception as e:
+            print(f"WebSocket writer failed, closing connection: {e}")
+            try:
+                await websocket.close(code=1011)
+            except Exception:
+                pass
+
+    async def send(payload: Dict[str, Any]):
+        await outbox.put(payload)
+
+    async def run_debate(session_id: str, initial_state):
+        try:
+            await stream_debate_ws(session_id, initial_state, send)
+        except asyncio.CancelledError:
+            cancel_events[session_id].set()
+            await send({"type": "debate_cancelled", "session_id": session_id})
+            print(f"Debate cancelled for session ID: {session_id}")
+            raise
+        except Exception as e:
+            print(f"An error occurred in debate {session_id}: {e}")
+            await send({"type": "error", "session_id": session_id, "message": str(e)})
+        finally:
+            debates.pop(session_id, None)
+            cancel_events.pop(session_id, None)
+
+    writer_task = asyncio.create_task(writer())
     try:
         while True:
-            data = await websocket.receive_json()
+            # Stop reading as soon as the writer exits; frames queued after
+            # that would never be delivered.
+            receive_task = asyncio.create_task(websocket.receive_text())
+            await asyncio.wait({receive_task, writer_task}, return_when=asyncio.FIRST_COMPLETED)
+            if not receive_task.done():
+                receive_task.cancel()
+                print(f"WebSocket writer stopped for {websocket.client.host}:{websocket.client.port}")
+                break
+
+            try:
+                data = json.loads(receive_task.result())
+            except json.JSONDecodeError:
+                await send({"type": "error", "message": "Message is not valid JSON"})
+                continue
+            if not isinstance(data, dict):
+                await send({"type": "error", "message": "Message must be a JSON object"})
+                continue
+
+            if data.get("type") == "cancel":
+                session_id = data.get("session_id")
+                if not isinstance(session_id, str):
+                    await send({"type": "error", "message": "cancel requires a string session_id"})
+                    continue
+                task = debates.get(session_id)
+                if task is None:
+                    await send({"type": "error", "session_id": session_id, "message": "No running debate with this session_id"})
+                    continue
+                cancel_events[session_id].set()
+                task.cancel()
+                continue
+
+            request_id = data.get("request_id")
             user_query = data.get("user_query")
 
             if not user_query:
-                await websocket.send_json({"type": "error", "message": "No user_query provided"})
+                await send({"type": "error", "request_id": request_id, "message": "No user_query provided"})
+                continue
+            if not isinstance(user_query, str):
+                await send({"type": "error", "request_id": request_id, "message": "user_query must be a string"})
+                continue
+
+            if len(debates) >= WS_MAX_CONCURRENT_DEBATES:
+                await send({
+                    "type": "error",
+                    "request_id": request_id,
+                    "message": f"Too many concurrent debates on this connection (max {WS_MAX_CONCURRENT_DEBATES})"
+                })
+                continue
+
+            try:
+                model_routing = build_routing(data.get("model_routing"), data.get("hedge"))
+            except ValueError as e:
+                await send({"type": "error", "request_id": request_id, "message": str(e)})
                 continue
 
             session_id = str(uuid.uuid4())
             print(f"Starting debate session ID: {session_id} for query: '{user_query}'")
 
-            initial_state: AgentState = {
-                "session_id": session_id,
-                "user_query": user_query,
-                "rag_context": "",
-                "round_number": 1,
-                "messages": [],
-                "tool_output": {},
-                "tool_calls_to_execute": []
-            }
-
-            # Stream LangChain graph output over WebSocket
-            async for event in graph_app.astream(initial_state, stream_mode="updates"):
-                for _, update in event.items():
-                    messages = update.get("messages", [])
-                    tool_outputs = update.get("tool_output", {})
-
-                    # Send tool results if any
-                    if tool_outputs:
-                        await websocket.send_json({"type": "tool_output", "data": tool_outputs})
-
-                    # Send AIMessage content
-                    for msg in messages:
-                        if isinstance(msg, AIMessage) and msg.content.strip():
-                            await websocket.send_json({
-                                "type": "ai_message",
-                                "name": msg.name,
-                                "content": msg.content
-                            })
-                    for msg in messages:
-                        print("MSG:", msg, "NAME:", msg.name)
-            await websocket.send_json({"type": "debate_finished", "session_id": session_id})
-            print(f"Debate finished for session ID: {session_id}")
+            cancel_events[session_id] = threading.Event()
+            initial_state = create_initial_state(session_id, user_query, model_routing, cancel_events[session_id])
+
+            await send({"type": "debate_started", "session_id": session_id, "request_id": request_id})
+            debates[session_id] = asyncio.create_task(run_debate(session_id, initial_state))
 
     except WebSocketDisconnect:
         print(f"WebSocket connection closed for {websocket.client.host}:{websocket.client.port}")
     except Exception as e:
         print(f"An error occurred in WebSocket: {e}")
-        await websocket.send_json({"type": "error", "message": str(e)})
+        await send({"type": "error", "message": str(e)})
+    finally:
+        running = list(debates.values())
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        outbox.put_nowait(None)
+        await asyncio.gather(writer_task, return_exceptions=True)
 
 @app.post("/stream")
 async def stream_debate_sse(request: Request):
@@ -134,18 +271,12 @@ async def stream_debate_sse(request: Request):
                 media_type="text/event-stream"
             )
 
+        model_routing = build_routing(data.get("model_routing"), data.get("hedge"))
+
         session_id = str(uuid.uuid4())
         print(f"Starting SSE debate session ID: {session_id} for query: '{user_query}'")
 
-        initial_state: AgentState = {
-            "session_id": session_id,
-            "user_query": user_query,
-            "rag_context": "",
-            "round_number": 1,
-            "messages": [],
-            "tool_output": {},
-            "tool_calls_to_execute": []
-        }
+        initial_state = create_initial_state(session_id, user_query, model_routing)
 
         async def generate_stream():
             try:
@@ -1,11 +1,13 @@
 import os
 import shutil
+from functools import lru_cache
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 from backend.config import CHROMA_PERSIST_DIRECTORY, EMBEDDING_MODEL_NAME, CHUNK_SIZE, CHUNK_OVERLAP
 
+@lru_cache(maxsize=1)
 def get_embedding_function():
     return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
 